@@ -1,8 +1,14 @@
-from random import randbytes
 import sys
+import os
+
+from profiling import PROFILE_ENV, phase, profile
+from keypool import token_bytes
+from compression import COMPRESSION_ENV, compress, decompress
+from schedule_store import load_schedule, save_schedule
+
 class RC5:
 
-    def __init__(self, w, R, key, strip_extra_nulls=False):
+    def __init__(self, w, R, key, strip_extra_nulls=False, schedule=None):
         self.w = w  # block size (32, 64 or 128 bits)
         self.R = R  # number of rounds (0 to 255)
         self.key = key  # key (0 to 2040 bits)
@@ -15,9 +21,21 @@ class RC5:
         self.mask = self.mod - 1
         self.b = len(key)
 
-        self.__keyAlign()
-        self.__keyExtend()
-        self.__shuffle()
+        if schedule is None:
+            self.__keyAlign()
+            self.__keyExtend()
+            self.__shuffle()
+        else:
+            self.S = list(schedule)  # expanded key computed earlier
+
+    @classmethod
+    def cached(cls, w, R, key):
+        # reuse the key schedule from the store (RC_SCHEDULE_STORE) if any
+        schedule = load_schedule("rc5", key, (w, R))
+        rc5 = cls(w, R, key, schedule=schedule)
+        if schedule is None:
+            save_schedule("rc5", key, (w, R), rc5.S, rc5.w8)
+        return rc5
 
     def __lshift(self, val, n):
         n %= self.w
@@ -83,7 +101,38 @@ class RC5:
         return (A.to_bytes(self.w8, byteorder='little')
                 + B.to_bytes(self.w8, byteorder='little'))
 
-    def encryptFile(self, inpFileName, outFileName):
+    def encryptChunk(self, data, last=True, context=b''):
+        res = []
+        for i in range(0, len(data), self.w4):
+            text = data[i:i + self.w4]
+            if len(text) != self.w4:
+                text = bytes(text).ljust(self.w4, b'\x00')
+            res.append(self.encryptBlock(text))
+        return b''.join(res)
+
+    def decryptChunk(self, data, last=True, context=b''):
+        res = []
+        for i in range(0, len(data), self.w4):
+            text = self.decryptBlock(data[i:i + self.w4])
+            if self.strip_extra_nulls:
+                text = text.rstrip(b'\x00')
+            res.append(text)
+        return b''.join(res)
+
+    def __pipeline(self, inpFileName, outFileName, transform,
+                   chunk_size, queue_depth, workers):
+        # read-ahead, encryption (worker processes) and write-behind overlap
+        from pipeline import run_pipeline  # multiprocessing is slow to import
+
+        chunk_size = max(chunk_size // self.w4, 1) * self.w4
+        with open(inpFileName, 'rb') as inp, open(outFileName, 'wb') as out:
+            run_pipeline(inp, out, transform, chunk_size, queue_depth, workers)
+
+    def encryptFile(self, inpFileName, outFileName, pipeline=False,
+                    chunk_size=1024 * 1024, queue_depth=4, workers=None):
+        if pipeline:
+            return self.__pipeline(inpFileName, outFileName, self.encryptChunk,
+                                   chunk_size, queue_depth, workers)
         with open(inpFileName, 'rb') as inp, open(outFileName, 'wb') as out:
             run = True
             while run:
@@ -96,7 +145,11 @@ class RC5:
                 text = self.encryptBlock(text)
                 out.write(text)
 
-    def decryptFile(self, inpFileName, outFileName):
+    def decryptFile(self, inpFileName, outFileName, pipeline=False,
+                    chunk_size=1024 * 1024, queue_depth=4, workers=None):
+        if pipeline:
+            return self.__pipeline(inpFileName, outFileName, self.decryptChunk,
+                                   chunk_size, queue_depth, workers)
         with open(inpFileName, 'rb') as inp, open(outFileName, 'wb') as out:
             while True:
                 text = inp.read(self.w4)
@@ -133,31 +186,60 @@ class RC5:
         return res.rstrip(b'\x00')
     
 
-def encrypt(message:str,block_size=64,key_length=128,round_count=12)->list[bytes,str]:
-    key=randbytes(key_length//8)
+def encrypt(message:str,block_size=64,key_length=128,round_count=12,compression=None)->list[bytes,str]:
+    with phase("key derivation"):
+        key=token_bytes(key_length//8)
+
+    with phase("key_generation"):
+        rc5 = RC5(block_size, round_count, key)
 
-    rc5 = RC5(block_size, round_count, key)
-    res=rc5.encryptBytes(bytes(message,encoding="utf-8"))
+    with phase("block parsing"):
+        message=bytes(message,encoding="utf-8")
+
+    with phase("compression"):
+        message=compress(message,compression)
+
+    with phase("rounds"):
+        res=rc5.encryptBytes(message)
        
-    return [key.hex(),res.hex()]
+    with phase("output encoding"):
+        return [key.hex(),res.hex()]
 
 def decrypt(message:str,key:bytes,block_size=64,round_count=12)->str:
 
-    rc5 = RC5(block_size, round_count, bytes.fromhex(key))
-    res=rc5.decryptBytes(bytes.fromhex(message))
-    return res.decode("utf-8")
+    with phase("key derivation"):
+        key=bytes.fromhex(key)
+
+    with phase("key_generation"):
+        rc5 = RC5.cached(block_size, round_count, key)
+
+    with phase("block parsing"):
+        message=bytes.fromhex(message)
+
+    with phase("rounds"):
+        res=rc5.decryptBytes(message)
+
+    with phase("compression"):
+        res=decompress(res)
+
+    with phase("output encoding"):
+        return res.decode("utf-8")
 
 
 if __name__ == '__main__':
-    type = str(sys.argv[1])  # Takes number from command line argument
-
-    if type=="encrypt":
-        key,res=encrypt(sys.argv[2])
-        print(key,res)
-    else:
-        res=decrypt(sys.argv[2],sys.argv[3])
-        print(res)
-    sys.stdout.flush()
+    # Set RC_PROFILE=<prefix> to profile the helper mode used by the server
+    with profile(os.environ.get(PROFILE_ENV)):
+        with phase("argument parsing"):
+            type = str(sys.argv[1])  # Takes number from command line argument
+
+        if type=="encrypt":
+            # Set RC_COMPRESSION=zlib|lzma to compress messages before encryption
+            key,res=encrypt(sys.argv[2],compression=os.environ.get(COMPRESSION_ENV))
+            print(key,res)
+        else:
+            res=decrypt(sys.argv[2],sys.argv[3])
+            print(res)
+        sys.stdout.flush()
 
 
 # key=randbytes(128//8)
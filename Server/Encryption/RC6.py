@@ -1,4 +1,3 @@
-from random import randbytes
 import sys
 import os
 
@@ -24,7 +23,13 @@ from contextlib import suppress
 from os import device_encoding
 from functools import partial
 from hashlib import sha256
-from os import urandom
+from os import getenv
+from time import perf_counter
+
+from profiling import PROFILE_ENV, phase, profile
+from keypool import token_bytes
+from compression import COMPRESSION_ENV, COMPRESSED_FILE, compress, decompress
+from schedule_store import load_schedule, save_schedule
 
 try:
     from binascii import a2b_hqx, b2a_hqx
@@ -34,7 +39,6 @@ else:
     uu_encoding = True
 
 basetwo = partial(int, base=2)
-unblock = partial(int.to_bytes, length=4, byteorder="little")
 
 
 class RC6Encryption:
@@ -43,18 +47,35 @@ class RC6Encryption:
     This class implements the RC6 encryption.
 
     Rounds possible values: {12, 16, 20}
+    Word size (w_bit) possible values: {16, 32, 64}, blocks are 4 words.
     """
 
+    P16 = 0xB7E1
+    Q16 = 0x9E37
     P32 = 0xB7E15163
     Q32 = 0x9E3779B9
+    P64 = 0xB7E151628AED2A6B
+    Q64 = 0x9E3779B97F4A7C15
 
     def __init__(
-        self, key: bytes, rounds: int = 20, w_bit: int = 32, lgw: int = 5
+        self,
+        key: bytes,
+        rounds: int = 20,
+        w_bit: int = 32,
+        lgw: int = None,
+        schedule: List[int] = None,
     ):
+        if w_bit not in (16, 32, 64):
+            raise ValueError("Invalid w_bit value, must be 16, 32 or 64")
+
         self.key_bytes = key
         self.rounds = rounds
         self.w_bit = w_bit
-        self.lgw = lgw
+        self.lgw = w_bit.bit_length() - 1 if lgw is None else lgw
+        self.word_size = w_bit // 8
+        self.block_size = self.word_size * 4
+        self.P = getattr(self, f"P{w_bit}")
+        self.Q = getattr(self, f"Q{w_bit}")
 
         self.round2_2 = rounds * 2 + 2
         self.round2_3 = self.round2_2 + 1
@@ -62,32 +83,57 @@ class RC6Encryption:
 
         self.modulo = 2**w_bit
 
+        if schedule is not None:
+            self.rc6_key = list(schedule)
+            return
+
         (
             self.key_binary_blocks,
             self.key_integer_reverse_blocks,
-        ) = self.get_blocks(key)
+        ) = self.get_blocks(key, self.word_size)
         self.key_blocks_number = len(self.key_binary_blocks)
 
-        self.rc6_key = [self.P32]
+        self.rc6_key = [self.P]
 
         self.key_generation()
 
+    @classmethod
+    def cached(
+        cls, key: bytes, rounds: int = 20, w_bit: int = 32, lgw: int = None
+    ) -> "RC6Encryption":
+        """
+        This function returns an instance using the key schedule
+        from the store (RC_SCHEDULE_STORE) and stores new ones.
+        """
+
+        params = (rounds, w_bit)
+        schedule = load_schedule("rc6", key, params)
+        rc6 = cls(key, rounds, w_bit, lgw, schedule)
+        if schedule is None:
+            save_schedule("rc6", key, params, rc6.rc6_key, rc6.word_size)
+        return rc6
+
     @staticmethod
-    def enumerate_blocks(data: bytes) -> Iterator[Tuple[int, int, int, int]]:
+    def enumerate_blocks(
+        data: bytes, word_size: int = 4
+    ) -> Iterator[Tuple[int, int, int, int]]:
         """
         This function returns a tuple of 4 integers for each blocks.
         """
 
-        _, blocks = RC6Encryption.get_blocks(data)
+        _, blocks = RC6Encryption.get_blocks(data, word_size)
 
         while blocks:
             a, b, c, d, *blocks = blocks
             yield a, b, c, d
 
     @staticmethod
-    def get_blocks(data: bytes) -> Tuple[List[str], List[int]]:
+    def get_blocks(
+        data: bytes, word_size: int = 4
+    ) -> Tuple[List[str], List[int]]:
         """
-        This function returns blocks (binary strings and integers) from data.
+        This function returns blocks (binary strings and integers) from data,
+        each block is a little endian word of word_size bytes.
         """
 
         binary_blocks = []
@@ -95,7 +141,7 @@ class RC6Encryption:
         block = ""
 
         for i, char in enumerate(data):
-            if i and not i % 4:
+            if i and not i % word_size:
                 binary_blocks.append(block)
                 integer_blocks.append(basetwo(block))
                 block = ""
@@ -107,7 +153,7 @@ class RC6Encryption:
         return binary_blocks, integer_blocks
 
     @staticmethod
-    def blocks_to_data(blocks: List[int]) -> bytes:
+    def blocks_to_data(blocks: List[int], word_size: int = 4) -> bytes:
         """
         This function returns data from blocks (binary strings).
         """
@@ -115,7 +161,7 @@ class RC6Encryption:
         data = b""
 
         for block in blocks:
-            data += unblock(block)
+            data += block.to_bytes(word_size, "little")
 
         return data
 
@@ -141,7 +187,7 @@ class RC6Encryption:
         """
 
         for i in range(0, self.round2_3):
-            self.rc6_key.append((self.rc6_key[i] + self.Q32) % self.modulo)
+            self.rc6_key.append((self.rc6_key[i] + self.Q) % self.modulo)
 
         a = b = i = j = 0
         v = 3 * (
@@ -156,7 +202,7 @@ class RC6Encryption:
             )
             b = self.key_integer_reverse_blocks[j] = self.left_rotation(
                 (self.key_integer_reverse_blocks[j] + a + b) % self.modulo,
-                (a + b) % 32,
+                (a + b) % self.w_bit,
             )
             i = (i + 1) % (self.round2_4)
             j = (j + 1) % self.key_blocks_number
@@ -173,13 +219,18 @@ class RC6Encryption:
             - returns bytes
         """
 
-        data = pkcs5_7padding(data)
+        with phase("block parsing"):
+            data = pkcs5_7padding(data, self.block_size)
+            _, blocks = self.get_blocks(data, self.word_size)
+
         encrypted = []
 
-        for block in self.enumerate_blocks(data):
-            encrypted.extend(self.encrypt(block))
+        with phase("rounds"):
+            for i in range(0, len(blocks), 4):
+                encrypted.extend(self.encrypt(blocks[i : i + 4]))
 
-        return self.blocks_to_data(encrypted)
+        with phase("output encoding"):
+            return self.blocks_to_data(encrypted, self.word_size)
 
     def data_decryption_ECB(self, data: bytes) -> bytes:
         """
@@ -191,12 +242,19 @@ class RC6Encryption:
             - returns bytes
         """
 
+        with phase("block parsing"):
+            _, blocks = self.get_blocks(data, self.word_size)
+
         decrypted = []
 
-        for block in self.enumerate_blocks(data):
-            decrypted.extend(self.decrypt(block))
+        with phase("rounds"):
+            for i in range(0, len(blocks), 4):
+                decrypted.extend(self.decrypt(blocks[i : i + 4]))
 
-        return remove_pkcs_padding(self.blocks_to_data(decrypted))
+        with phase("output encoding"):
+            return remove_pkcs_padding(
+                self.blocks_to_data(decrypted, self.word_size)
+            )
 
     def data_encryption_CBC(
         self, data: bytes, iv: bytes = None
@@ -212,27 +270,31 @@ class RC6Encryption:
         """
 
         if iv is None:
-            _iv = urandom(16)
+            _iv = token_bytes(self.block_size)
         else:
             iv_length = len(iv)
-            _iv = bytes(iv[i % iv_length] for i in range(16))
+            _iv = bytes(iv[i % iv_length] for i in range(self.block_size))
 
-        _, iv = self.get_blocks(_iv)
+        with phase("block parsing"):
+            _, iv = self.get_blocks(_iv, self.word_size)
+            data = pkcs5_7padding(data, self.block_size)
+            _, blocks = self.get_blocks(data, self.word_size)
 
-        data = pkcs5_7padding(data)
         encrypted = []
 
-        for block in self.enumerate_blocks(data):
-            block = (
-                block[0] ^ iv[0],
-                block[1] ^ iv[1],
-                block[2] ^ iv[2],
-                block[3] ^ iv[3],
-            )
-            iv = self.encrypt(block)
-            encrypted.extend(iv)
+        with phase("rounds"):
+            for i in range(0, len(blocks), 4):
+                block = (
+                    blocks[i] ^ iv[0],
+                    blocks[i + 1] ^ iv[1],
+                    blocks[i + 2] ^ iv[2],
+                    blocks[i + 3] ^ iv[3],
+                )
+                iv = self.encrypt(block)
+                encrypted.extend(iv)
 
-        return _iv, self.blocks_to_data(encrypted)
+        with phase("output encoding"):
+            return _iv, self.blocks_to_data(encrypted, self.word_size)
 
     def data_decryption_CBC(self, data: bytes, iv: bytes) -> bytes:
         """
@@ -244,10 +306,110 @@ class RC6Encryption:
             - returns bytes
         """
 
-        _, iv = self.get_blocks(iv)
+        with phase("block parsing"):
+            _, iv = self.get_blocks(iv, self.word_size)
+            _, blocks = self.get_blocks(data, self.word_size)
+
+        decrypted = []
+
+        with phase("rounds"):
+            for i in range(0, len(blocks), 4):
+                block = blocks[i : i + 4]
+                decrypted_block = self.decrypt(block)
+                decrypted.extend(
+                    (
+                        decrypted_block[0] ^ iv[0],
+                        decrypted_block[1] ^ iv[1],
+                        decrypted_block[2] ^ iv[2],
+                        decrypted_block[3] ^ iv[3],
+                    )
+                )
+                iv = block
+
+        with phase("output encoding"):
+            return remove_pkcs_padding(
+                self.blocks_to_data(decrypted, self.word_size)
+            )
+
+    def encrypt_chunk_ECB(
+        self, data: bytes, last: bool = True, context: bytes = b""
+    ) -> bytes:
+        """
+        This function encrypts a chunk (multiple of the block size)
+        using ECB mode, only the last chunk is padded.
+        """
+
+        if last:
+            data = pkcs5_7padding(data, self.block_size)
+
+        _, blocks = self.get_blocks(data, self.word_size)
+        encrypted = []
+
+        for i in range(0, len(blocks), 4):
+            encrypted.extend(self.encrypt(blocks[i : i + 4]))
+
+        return self.blocks_to_data(encrypted, self.word_size)
+
+    def decrypt_chunk_ECB(
+        self, data: bytes, last: bool = True, context: bytes = b""
+    ) -> bytes:
+        """
+        This function decrypts a chunk using ECB mode,
+        padding is removed from the last chunk.
+        """
+
+        _, blocks = self.get_blocks(data, self.word_size)
+        decrypted = []
+
+        for i in range(0, len(blocks), 4):
+            decrypted.extend(self.decrypt(blocks[i : i + 4]))
+
+        data = self.blocks_to_data(decrypted, self.word_size)
+        return remove_pkcs_padding(data) if last else data
+
+    def encrypt_chunk_CBC(
+        self, data: bytes, last: bool = True, context: bytes = b""
+    ) -> bytes:
+        """
+        This function encrypts a chunk using CBC mode, context is the IV
+        (or the last encrypted block of the previous chunk).
+        """
+
+        if last:
+            data = pkcs5_7padding(data, self.block_size)
+
+        _, iv = self.get_blocks(context, self.word_size)
+        _, blocks = self.get_blocks(data, self.word_size)
+        encrypted = []
+
+        for i in range(0, len(blocks), 4):
+            iv = self.encrypt(
+                (
+                    blocks[i] ^ iv[0],
+                    blocks[i + 1] ^ iv[1],
+                    blocks[i + 2] ^ iv[2],
+                    blocks[i + 3] ^ iv[3],
+                )
+            )
+            encrypted.extend(iv)
+
+        return self.blocks_to_data(encrypted, self.word_size)
+
+    def decrypt_chunk_CBC(
+        self, data: bytes, last: bool = True, context: bytes = b""
+    ) -> bytes:
+        """
+        This function decrypts a chunk using CBC mode, context is the IV
+        (or the last block of the previous chunk) so chunks
+        can be decrypted in parallel.
+        """
+
+        _, iv = self.get_blocks(context, self.word_size)
+        _, blocks = self.get_blocks(data, self.word_size)
         decrypted = []
 
-        for block in self.enumerate_blocks(data):
+        for i in range(0, len(blocks), 4):
+            block = blocks[i : i + 4]
             decrypted_block = self.decrypt(block)
             decrypted.extend(
                 (
@@ -259,7 +421,8 @@ class RC6Encryption:
             )
             iv = block
 
-        return remove_pkcs_padding(self.blocks_to_data(decrypted))
+        data = self.blocks_to_data(decrypted, self.word_size)
+        return remove_pkcs_padding(data) if last else data
 
     def encrypt(
         self, data: Union[bytes, Tuple[int, int, int, int]]
@@ -271,7 +434,7 @@ class RC6Encryption:
         """
 
         if isinstance(data, bytes):
-            _, data = self.get_blocks(data)
+            _, data = self.get_blocks(data, self.word_size)
         a, b, c, d = data
 
         b = (b + self.rc6_key[0]) % self.modulo
@@ -301,7 +464,7 @@ class RC6Encryption:
         """
 
         if isinstance(data, bytes):
-            _, data = self.get_blocks(data)
+            _, data = self.get_blocks(data, self.word_size)
         a, b, c, d = data
 
         c = (c - self.rc6_key[self.round2_3]) % self.modulo
@@ -363,7 +526,7 @@ def parse_args() -> Namespace:
         "-m",
         help=(
             "Ecryption mode, for CBC encryption IV"
-            " is write on the first 16 bytes of the encrypted data."
+            " is write on the first block (4 words) of the encrypted data."
         ),
         default="ECB",
         choices={"ECB", "CBC"},
@@ -456,17 +619,28 @@ def parse_args() -> Namespace:
         "--rounds", "-r", type=int, help="RC6 rounds", default=20
     )
     parser.add_argument(
-        "--w-bit", "-b", type=int, help="RC6 w-bit", default=32
+        "--w-bit",
+        "-b",
+        type=int,
+        help="RC6 w-bit (64 bits words use 32 bytes blocks)",
+        default=32,
+        choices=(16, 32, 64),
     )
     parser.add_argument(
         "--iv",
         "-I",
         help=(
             "IV for CBC mode only, for decryption"
-            " if IV is not set the 16 first bytes are used instead."
+            " if IV is not set the first block is used instead."
         ),
     )
-    parser.add_argument("--lgw", "-l", type=int, help="RC6 lgw", default=5)
+    parser.add_argument(
+        "--lgw",
+        "-l",
+        type=int,
+        help="RC6 lgw (default: log2 of w-bit)",
+        default=None,
+    )
 
     parser.add_argument(
         "--sha256",
@@ -474,6 +648,55 @@ def parse_args() -> Namespace:
         action=BooleanOptionalAction,
         default=True,
     )
+    parser.add_argument(
+        "--compress",
+        "-z",
+        help=(
+            "Compress data before encryption, compressed outputs start"
+            " with a header so decryption decompresses them."
+        ),
+        choices=("zlib", "lzma"),
+    )
+    parser.add_argument(
+        "--compress-threshold",
+        type=int,
+        help="Data shorter than this size (in bytes) is not compressed.",
+        default=256,
+    )
+    parser.add_argument(
+        "--pipeline",
+        "-P",
+        help=(
+            "Overlap file reading, encryption (worker processes)"
+            " and writing, input and output must be raw files."
+        ),
+        action="store_true",
+    )
+    parser.add_argument(
+        "--chunk-size",
+        type=int,
+        help="Pipeline chunk size in bytes.",
+        default=1024 * 1024,
+    )
+    parser.add_argument(
+        "--queue-depth",
+        type=int,
+        help="Pipeline chunks read ahead and written behind.",
+        default=4,
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        help="Pipeline worker processes (default: CPU count).",
+    )
+    parser.add_argument(
+        "--profile",
+        "-p",
+        help=(
+            "Profile the run and write PROFILE.pstats, PROFILE.collapsed"
+            " (flamegraph stacks) and the phases breakdown on stderr."
+        ),
+    )
     parser.add_argument("key", help="Encryption key.")
 
     arguments = parser.parse_args()
@@ -481,6 +704,35 @@ def parse_args() -> Namespace:
     if arguments.input_file is None:
         arguments.input_file = stdin
 
+    if arguments.pipeline and (
+        arguments.input_string
+        or arguments.input_encoding
+        or arguments.output_encoding
+        or arguments.compress
+        or any(
+            getattr(arguments, name, False)
+            for name in ("base85", "base64", "base32", "base16", "uu")
+        )
+    ):
+        parser.error(
+            "--pipeline requires an input file without"
+            " encodings or compression"
+        )
+
+    # compressed files are decompressed as a whole and their header
+    # breaks the chunks alignment
+    peek = getattr(arguments.input_file, "peek", None)
+    if (
+        arguments.pipeline
+        and arguments.decryption
+        and peek is not None
+        and peek(len(COMPRESSED_FILE)).startswith(COMPRESSED_FILE)
+    ):
+        parser.error(
+            "--pipeline can't decrypt compressed files,"
+            " decrypt them without --pipeline"
+        )
+
     return arguments
 
 
@@ -595,14 +847,35 @@ def main() -> int:
     This function executes this file from the command line.
     """
 
+    start = perf_counter()
     arguments = parse_args()
+    parsing = perf_counter() - start
+
+    with profile(arguments.profile or getenv(PROFILE_ENV)) as profiler:
+        if profiler is not None:
+            profiler.record("argument parsing", parsing)
+        return process(arguments)
+
+
+def process(arguments: Namespace) -> int:
+    """
+    This function encrypts or decrypts data from parsed arguments.
+    """
 
     if arguments.input_string:
         arguments.input_string = arguments.input_string.encode("utf-8")
 
-    rc6 = RC6Encryption(
-        get_key(arguments), arguments.rounds, arguments.w_bit, arguments.lgw
-    )
+    with phase("key derivation"):
+        key = get_key(arguments)
+
+    with phase("key_generation"):
+        rc6 = RC6Encryption(
+            key, arguments.rounds, arguments.w_bit, arguments.lgw
+        )
+
+    if arguments.pipeline:
+        return process_pipeline(arguments, rc6)
+
     format_output = any(
         [
             arguments.base85,
@@ -614,13 +887,28 @@ def main() -> int:
         ]
     )
 
+    with phase("input"):
+        data = get_data(arguments)
+
+    if arguments.decryption:
+        compressed = data.startswith(COMPRESSED_FILE)
+        if compressed:
+            data = data[len(COMPRESSED_FILE) :]
+    else:
+        with phase("compression"):
+            packed = compress(
+                data, arguments.compress, arguments.compress_threshold
+            )
+            compressed = packed is not data
+            data = packed
+
     if arguments.mode == "ECB":
         function = (
             rc6.data_decryption_ECB
             if arguments.decryption
             else rc6.data_encryption_ECB
         )
-        data = function(get_data(arguments))
+        data = function(data)
     elif arguments.mode == "CBC":
         function = (
             rc6.data_decryption_CBC
@@ -628,46 +916,138 @@ def main() -> int:
             else rc6.data_encryption_CBC
         )
         if arguments.decryption and not arguments.iv:
-            data = get_data(arguments)
-            iv = data[:16]
-            data = data[16:]
+            iv = data[: rc6.block_size]
+            data = data[rc6.block_size :]
         else:
             iv = arguments.iv.encode()
-            data = get_data(arguments)
 
         data = function(data, iv)
 
         if isinstance(data, tuple):
             data = b"".join(data)
 
-    if format_output:
-        data = output_encoding(data, arguments)
+    if compressed and arguments.decryption:
+        with phase("compression"):
+            data = decompress(data)
+    elif compressed:
+        data = COMPRESSED_FILE + data
+
+    with phase("output encoding"):
+        if format_output:
+            data = output_encoding(data, arguments)
+
+    with phase("output"):
+        arguments.output_file.write(data)
+    return 0
+
+
+def process_pipeline(arguments: Namespace, rc6: RC6Encryption) -> int:
+    """
+    This function encrypts or decrypts the input file
+    with overlapped I/O and computation.
+    """
+
+    from pipeline import run_pipeline  # multiprocessing is slow to import
+
+    input_ = arguments.input_file
+    output = arguments.output_file
+    parameters = {
+        "chunk_size": max(arguments.chunk_size // rc6.block_size, 1)
+        * rc6.block_size,
+        "queue_depth": arguments.queue_depth,
+        "workers": arguments.workers,
+    }
+
+    if arguments.mode == "ECB":
+        function = (
+            rc6.decrypt_chunk_ECB
+            if arguments.decryption
+            else rc6.encrypt_chunk_ECB
+        )
+        run_pipeline(input_, output, function, **parameters)
+        output.flush()
+        return 0
+
+    if arguments.iv:
+        iv = arguments.iv.encode()
+        iv = bytes(iv[i % len(iv)] for i in range(rc6.block_size))
+    elif arguments.decryption:
+        iv = input_.read(rc6.block_size)
+    else:
+        iv = token_bytes(rc6.block_size)
+
+    if arguments.decryption:
+        run_pipeline(
+            input_,
+            output,
+            rc6.decrypt_chunk_CBC,
+            context=rc6.block_size,
+            initial_context=iv,
+            **parameters,
+        )
+    else:
+        # CBC encryption is sequential: one worker thread chains the IV
+        # while the reader and the writer threads overlap the I/O.
+        output.write(iv)
+        parameters.update(executor="thread", workers=1)
+
+        def function(data: bytes, last: bool, context: bytes) -> bytes:
+            nonlocal iv
+            data = rc6.encrypt_chunk_CBC(data, last, iv)
+            iv = data[-rc6.block_size :]
+            return data
+
+        run_pipeline(input_, output, function, **parameters)
 
-    arguments.output_file.write(data)
+    output.flush()
     return 0
 
 
-def encrypt(message:str,key_length=128,round_count=20)->list[bytes,str]:
-    key=randbytes(key_length//8)
+def encrypt(message:str,key_length=128,round_count=20,w_bit=32,compression=None)->list[bytes,str]:
+    with phase("key derivation"):
+        key=token_bytes(key_length//8)
 
-    rc6 = RC6Encryption(key,rounds=round_count)
+    with phase("key_generation"):
+        rc6 = RC6Encryption(key,rounds=round_count,w_bit=w_bit)
     
-    res=rc6.data_encryption_ECB(bytes(message,encoding="utf-8"))
-    return [key.hex(),res.hex()]
+    with phase("compression"):
+        message=compress(bytes(message,encoding="utf-8"),compression)
 
-def decrypt(message:str,key:bytes,round_count=20)->str:
+    res=rc6.data_encryption_ECB(message)
+    with phase("output encoding"):
+        return [key.hex(),res.hex()]
 
-    rc6 = RC6Encryption(bytes.fromhex(key),rounds=round_count)
-    res = rc6.data_decryption_ECB(bytes.fromhex(message))    
-    return res.decode("utf-8")
+def decrypt(message:str,key:bytes,round_count=20,w_bit=32)->str:
+
+    with phase("key derivation"):
+        key=bytes.fromhex(key)
+
+    with phase("key_generation"):
+        rc6 = RC6Encryption.cached(key,rounds=round_count,w_bit=w_bit)
+
+    with phase("block parsing"):
+        message=bytes.fromhex(message)
+
+    res = rc6.data_decryption_ECB(message)
+    with phase("compression"):
+        res=decompress(res)
+    with phase("output encoding"):
+        return res.decode("utf-8")
 
 if __name__ == '__main__':
-    type = str(sys.argv[1])  # Takes number from command line argument
-    
-    if type=="encrypt":
-        key,res=encrypt(sys.argv[2])
-        print(key,res)
-    else:
-        res=decrypt(sys.argv[2],sys.argv[3])
-        print(res)
-    sys.stdout.flush()
\ No newline at end of file
+    if sys.argv[1:2] not in (["encrypt"], ["decrypt"]):
+        exit(main())  # full command line (see parse_args)
+
+    # Set RC_PROFILE=<prefix> to profile the helper mode used by the server
+    with profile(os.environ.get(PROFILE_ENV)):
+        with phase("argument parsing"):
+            type = str(sys.argv[1])  # Takes number from command line argument
+
+        if type=="encrypt":
+            # Set RC_COMPRESSION=zlib|lzma to compress messages before encryption
+            key,res=encrypt(sys.argv[2],compression=os.environ.get(COMPRESSION_ENV))
+            print(key,res)
+        else:
+            res=decrypt(sys.argv[2],sys.argv[3])
+            print(res)
+        sys.stdout.flush()
\ No newline at end of file
@@ -0,0 +1,74 @@
+__all__ = [
+    "COMPRESSION_ENV",
+    "COMPRESSED_FILE",
+    "METHODS",
+    "compress",
+    "decompress",
+]
+
+from struct import Struct
+import zlib
+
+COMPRESSION_ENV = "RC_COMPRESSION"
+
+# 0xFF never appears in UTF-8 text, so uncompressed messages
+# can't be mistaken for compressed ones.
+MAGIC = b"\xffZ"
+# Arbitrary binary files may start with MAGIC: the command line writes
+# this header before the ciphertext and only decompresses when it's set.
+COMPRESSED_FILE = b"\x89RCZ\r\n\x1a\n"
+# magic, method, compressed length (RC5 decryption strips trailing
+# NUL bytes, they are restored from the length)
+HEADER = Struct(">2sBI")
+
+METHODS = {"zlib": 1, "lzma": 2}
+
+
+def compress(data: bytes, method: str = "zlib", threshold: int = 256) -> bytes:
+    """
+    This function compresses data and adds the compression header,
+    data is returned unchanged when it is shorter than threshold
+    or when compression does not make it smaller.
+    """
+
+    if not method:
+        return data
+    if method not in METHODS:
+        # checked before the threshold: short messages must not hide it
+        raise ValueError("Invalid compression method value")
+    if len(data) < threshold:
+        return data
+
+    if method == "zlib":
+        compressed = zlib.compress(data, 6)
+    else:
+        from lzma import compress as lzma_compress
+
+        compressed = lzma_compress(data)
+
+    compressed = (
+        HEADER.pack(MAGIC, METHODS[method], len(compressed)) + compressed
+    )
+    return compressed if len(compressed) < len(data) else data
+
+
+def decompress(data: bytes) -> bytes:
+    """
+    This function decompresses data when it starts with
+    the compression header (returns it unchanged otherwise).
+    """
+
+    if len(data) < HEADER.size or not data.startswith(MAGIC):
+        return data
+
+    _, method, length = HEADER.unpack_from(data)
+    compressed = data[HEADER.size : HEADER.size + length].ljust(length, b"\0")
+
+    if method == METHODS["zlib"]:
+        return zlib.decompress(compressed)
+    elif method == METHODS["lzma"]:
+        from lzma import decompress as lzma_decompress
+
+        return lzma_decompress(compressed)
+
+    raise ValueError("Invalid compression method value")
@@ -0,0 +1,408 @@
+import sys
+
+__all__ = [
+    "ContainerWriter",
+    "ContainerReader",
+    "encrypt_file",
+    "decrypt_file",
+]
+
+from argparse import Namespace, ArgumentParser, FileType
+from typing import BinaryIO, Callable, List, Tuple
+from collections import namedtuple
+from hashlib import sha256
+from struct import Struct
+
+from keypool import token_bytes
+from RC6 import RC6Encryption
+from RC5 import RC5
+
+MAGIC = b"RCCF"
+VERSION = 1
+CIPHERS = {"rc5": 5, "rc6": 6}
+DEFAULTS = {"rc5": (64, 12), "rc6": (32, 20)}
+MIN_BLOCK_SIZE = 16
+
+# magic, version, cipher, w_bit, rounds, chunk_size
+HEADER = Struct(">4sBBBBI")
+# index_offset, chunks number, magic
+FOOTER = Struct(">QI4s")
+# ciphertext offset, length (+ nonce)
+ENTRY = Struct(">QI")
+
+Chunk = namedtuple("Chunk", ["start", "offset", "length", "nonce"])
+
+# Container layout, chunks are encrypted in CTR mode (counter blocks are
+# the chunk nonce + a big endian block counter) so ciphertext and
+# plaintext lengths are the same:
+#
+#     header | chunk 0 | chunk 1 | ... | index (entry + nonce) | footer
+
+
+def get_cipher(
+    cipher: str, key: bytes, w_bit: int, rounds: int
+) -> Tuple[int, Callable[[bytes], bytes]]:
+    """
+    This function returns the block size and the block encryption
+    function of the cipher.
+    """
+
+    if cipher == "rc5":
+        rc5 = RC5(w_bit, rounds, key)
+        return rc5.w4, rc5.encryptBlock
+
+    rc6 = RC6Encryption(key, rounds, w_bit)
+    return rc6.block_size, lambda block: rc6.blocks_to_data(
+        rc6.encrypt(block), rc6.word_size
+    )
+
+
+def xor(data: bytes, keystream: bytes) -> bytes:
+    """
+    This function returns data XOR keystream (same length).
+    """
+
+    return (
+        int.from_bytes(data, "big") ^ int.from_bytes(keystream, "big")
+    ).to_bytes(len(data), "big")
+
+
+class _Container:
+
+    """
+    This class implements the CTR keystream shared by writer and reader.
+    """
+
+    def __init__(
+        self,
+        key: bytes,
+        cipher: str,
+        chunk_size: int,
+        w_bit: int = None,
+        rounds: int = None,
+    ):
+        if chunk_size <= 0:
+            raise ValueError("Chunk size must be positive")
+
+        default_w_bit, default_rounds = DEFAULTS[cipher]
+        self.cipher = cipher
+        self.chunk_size = chunk_size
+        self.w_bit = w_bit or default_w_bit
+        self.rounds = rounds or default_rounds
+
+        self.block_size, self.encrypt_block = get_cipher(
+            cipher, key, self.w_bit, self.rounds
+        )
+        if self.block_size < MIN_BLOCK_SIZE:
+            # smaller blocks leave too few random nonce bits per chunk,
+            # nonce collisions (same key for all files) reuse keystream
+            raise ValueError(
+                "Block size must be at least 16 bytes"
+                " (RC5 w_bit 64, RC6 w_bit 32 or 64)"
+            )
+
+        self.nonce_size = self.block_size // 2
+        self.counter_size = self.block_size - self.nonce_size
+
+        if chunk_size // self.block_size + 1 >= 256**self.counter_size:
+            raise ValueError("Chunk size is too large for this block size")
+
+    def keystream(self, nonce: bytes, first: int, last: int) -> bytes:
+        """
+        This function returns the keystream for blocks first to last
+        (excluded) of a chunk.
+        """
+
+        return b"".join(
+            self.encrypt_block(
+                nonce + counter.to_bytes(self.counter_size, "big")
+            )
+            for counter in range(first, last)
+        )
+
+    def header(self) -> bytes:
+        """
+        This function returns the container header.
+        """
+
+        return HEADER.pack(
+            MAGIC,
+            VERSION,
+            CIPHERS[self.cipher],
+            self.w_bit,
+            self.rounds,
+            self.chunk_size,
+        )
+
+
+class ContainerWriter(_Container):
+
+    """
+    This class writes a seekable encrypted container, chunks are
+    encrypted independently with a random nonce.
+    """
+
+    def __init__(
+        self,
+        file: BinaryIO,
+        key: bytes,
+        cipher: str = "rc6",
+        chunk_size: int = 64 * 1024,
+        w_bit: int = None,
+        rounds: int = None,
+    ):
+        super().__init__(key, cipher, chunk_size, w_bit, rounds)
+        self.file = file
+        self.chunks: List[Chunk] = []
+        self.buffer = b""
+        self.size = 0
+
+        file.write(self.header())
+        self.offset = HEADER.size
+
+    def write_chunk(self, data: bytes) -> None:
+        """
+        This function encrypts and writes one chunk.
+        """
+
+        nonce = token_bytes(self.nonce_size)
+        blocks = -(-len(data) // self.block_size)
+        keystream = self.keystream(nonce, 0, blocks)
+        self.file.write(xor(data, keystream[: len(data)]))
+
+        self.chunks.append(Chunk(self.size, self.offset, len(data), nonce))
+        self.offset += len(data)
+        self.size += len(data)
+
+    def write(self, data: bytes) -> None:
+        """
+        This function buffers data and writes full chunks.
+        """
+
+        self.buffer += data
+        while len(self.buffer) >= self.chunk_size:
+            self.write_chunk(self.buffer[: self.chunk_size])
+            self.buffer = self.buffer[self.chunk_size :]
+
+    def close(self) -> None:
+        """
+        This function writes the last chunk, the index and the footer.
+        """
+
+        if self.buffer:
+            self.write_chunk(self.buffer)
+            self.buffer = b""
+
+        for chunk in self.chunks:
+            self.file.write(ENTRY.pack(chunk.offset, chunk.length))
+            self.file.write(chunk.nonce)
+
+        self.file.write(FOOTER.pack(self.offset, len(self.chunks), MAGIC))
+
+    def __enter__(self) -> "ContainerWriter":
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
+
+
+class ContainerReader(_Container):
+
+    """
+    This class decrypts byte ranges of a container, only the blocks
+    covering the range are read and decrypted.
+    """
+
+    def __init__(self, file: BinaryIO, key: bytes):
+        self.file = file
+
+        file.seek(0)
+        magic, version, cipher, w_bit, rounds, chunk_size = HEADER.unpack(
+            file.read(HEADER.size)
+        )
+        if magic != MAGIC or version != VERSION:
+            raise ValueError("Invalid container header")
+
+        names = {value: name for name, value in CIPHERS.items()}
+        if cipher not in names:
+            raise ValueError("Invalid container cipher")
+        cipher = names[cipher]
+        super().__init__(key, cipher, chunk_size, w_bit, rounds)
+
+        file.seek(-FOOTER.size, 2)
+        index_offset, number, magic = FOOTER.unpack(file.read(FOOTER.size))
+        if magic != MAGIC:
+            raise ValueError("Invalid container footer")
+
+        entry_size = ENTRY.size + self.nonce_size
+        file.seek(index_offset)
+        index = file.read(number * entry_size)
+
+        self.chunks: List[Chunk] = []
+        self.size = 0
+        for i in range(0, len(index), entry_size):
+            offset, length = ENTRY.unpack_from(index, i)
+            nonce = index[i + ENTRY.size : i + entry_size]
+            self.chunks.append(Chunk(self.size, offset, length, nonce))
+            self.size += length
+
+    def read_chunk_range(self, chunk: Chunk, start: int, stop: int) -> bytes:
+        """
+        This function decrypts bytes start to stop (excluded)
+        of a chunk.
+        """
+
+        first = start // self.block_size
+        last = -(-stop // self.block_size)
+        keystream = self.keystream(chunk.nonce, first, last)
+        skip = start - first * self.block_size
+
+        self.file.seek(chunk.offset + start)
+        return xor(
+            self.file.read(stop - start),
+            keystream[skip : skip + stop - start],
+        )
+
+    def read_chunk(self, index: int) -> bytes:
+        """
+        This function decrypts a full chunk.
+        """
+
+        chunk = self.chunks[index]
+        return self.read_chunk_range(chunk, 0, chunk.length)
+
+    def read_range(self, start: int, length: int) -> bytes:
+        """
+        This function decrypts length bytes from the start offset
+        of the plaintext.
+        """
+
+        if start < 0 or length < 0:
+            raise ValueError("Range start and length must not be negative")
+
+        stop = min(start + length, self.size)
+        if start >= stop:
+            return b""
+        data = []
+
+        for chunk in self.chunks[start // self.chunk_size :]:
+            if chunk.start >= stop:
+                break
+            data.append(
+                self.read_chunk_range(
+                    chunk,
+                    max(start - chunk.start, 0),
+                    min(stop - chunk.start, chunk.length),
+                )
+            )
+
+        return b"".join(data)
+
+
+def encrypt_file(
+    input_: BinaryIO, output: BinaryIO, key: bytes, **parameters
+) -> None:
+    """
+    This function writes input as an encrypted container.
+    """
+
+    with ContainerWriter(output, key, **parameters) as writer:
+        while data := input_.read(writer.chunk_size):
+            writer.write(data)
+
+
+def decrypt_file(input_: BinaryIO, output: BinaryIO, key: bytes) -> None:
+    """
+    This function decrypts a full container.
+    """
+
+    reader = ContainerReader(input_, key)
+    for index in range(len(reader.chunks)):
+        output.write(reader.read_chunk(index))
+
+
+def parse_args() -> Namespace:
+    """
+    This function parse command line arguments.
+    """
+
+    parser = ArgumentParser(
+        description="This script reads and writes seekable encrypted files."
+    )
+    parser.add_argument(
+        "action",
+        choices=("encrypt", "decrypt", "range"),
+        help="Encrypt to, decrypt or decrypt a byte range of a container.",
+    )
+    parser.add_argument(
+        "--input-file",
+        "-i",
+        type=FileType("rb"),
+        default=sys.stdin.buffer,
+        help="The input file.",
+    )
+    parser.add_argument(
+        "--output-file",
+        "-o",
+        type=FileType("wb"),
+        default=sys.stdout.buffer,
+        help="The output file.",
+    )
+    parser.add_argument(
+        "--cipher", "-c", choices=tuple(CIPHERS), default="rc6"
+    )
+    parser.add_argument(
+        "--chunk-size",
+        "-C",
+        type=int,
+        default=64 * 1024,
+        help="Plaintext bytes per chunk.",
+    )
+    parser.add_argument("--w-bit", "-b", type=int, help="Word size.")
+    parser.add_argument("--rounds", "-r", type=int, help="Rounds.")
+    parser.add_argument(
+        "--offset", type=int, default=0, help="Range start (range only)."
+    )
+    parser.add_argument(
+        "--length", type=int, default=-1, help="Range length (range only)."
+    )
+    parser.add_argument(
+        "key", help="Encryption key (its sha256 hash is used as the key)."
+    )
+    return parser.parse_args()
+
+
+def main() -> int:
+    """
+    This function executes this file from the command line.
+    """
+
+    arguments = parse_args()
+    key = sha256(arguments.key.encode()).digest()
+
+    if arguments.action == "encrypt":
+        encrypt_file(
+            arguments.input_file,
+            arguments.output_file,
+            key,
+            cipher=arguments.cipher,
+            chunk_size=arguments.chunk_size,
+            w_bit=arguments.w_bit,
+            rounds=arguments.rounds,
+        )
+    elif arguments.action == "decrypt":
+        decrypt_file(arguments.input_file, arguments.output_file, key)
+    else:
+        reader = ContainerReader(arguments.input_file, key)
+        length = (
+            reader.size if arguments.length < 0 else arguments.length
+        )
+        data = reader.read_range(arguments.offset, length)
+        arguments.output_file.write(data)
+
+    arguments.output_file.flush()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,83 @@
+import os
+
+__all__ = ["KeyPool", "token_bytes", "set_batch_size"]
+
+from threading import Lock
+
+
+class KeyPool:
+
+    """
+    This class hands out keys and IVs from batches of os.urandom bytes.
+
+    One getrandom syscall refills batch_size bytes, handed out bytes
+    are wiped from the batch and never handed out twice (the pool
+    is emptied in forked children).
+    """
+
+    def __init__(self, batch_size: int = 256):
+        self.batch_size = batch_size
+        self._batch = bytearray()
+        self._reset()
+        os.register_at_fork(after_in_child=self._reset)
+
+    def _reset(self) -> None:
+        """
+        This function empties the pool, in a forked child the batch
+        is a copy of the parent one and must not be reused.
+        """
+
+        self._lock = Lock()
+        self.resize(self.batch_size)
+
+    def resize(self, batch_size: int) -> None:
+        """
+        This function wipes the batch and sets the next batches size.
+        """
+
+        with self._lock:
+            self._batch[:] = bytes(len(self._batch))
+            self.batch_size = batch_size
+            self._batch = bytearray(batch_size)
+            self._offset = batch_size
+
+    def take(self, size: int) -> bytes:
+        """
+        This function returns size random bytes.
+        """
+
+        if size > self.batch_size:
+            return os.urandom(size)
+
+        with self._lock:
+            offset = self._offset
+            if offset + size > self.batch_size:
+                self._batch[:] = os.urandom(self.batch_size)
+                offset = 0
+
+            self._offset = offset + size
+            with memoryview(self._batch) as view:
+                data = bytes(view[offset : offset + size])
+                view[offset : offset + size] = bytes(size)
+            return data
+
+
+_pool = KeyPool()
+
+
+def set_batch_size(batch_size: int) -> None:
+    """
+    This function resizes the default pool batches, the default
+    (256 bytes) suits one-shot helper processes, long-running
+    processes should use larger batches.
+    """
+
+    _pool.resize(batch_size)
+
+
+def token_bytes(size: int) -> bytes:
+    """
+    This function returns size random bytes from the default pool.
+    """
+
+    return _pool.take(size)
@@ -0,0 +1,119 @@
+__all__ = ["run_pipeline"]
+
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from multiprocessing import get_all_start_methods, get_context
+from typing import Any, BinaryIO, Callable
+from threading import Thread, Event
+from queue import Queue, Empty, Full
+
+Transform = Callable[[bytes, bool, bytes], bytes]
+
+
+def _put(queue: Queue, item: Any, stop: Event) -> bool:
+    """
+    This function puts item in a bounded queue unless the pipeline
+    is stopped (returns False in that case).
+    """
+
+    while not stop.is_set():
+        try:
+            queue.put(item, timeout=0.1)
+            return True
+        except Full:
+            pass
+    return False
+
+
+def run_pipeline(
+    input_: BinaryIO,
+    output: BinaryIO,
+    transform: Transform,
+    chunk_size: int = 1024 * 1024,
+    queue_depth: int = 4,
+    workers: int = None,
+    executor: str = "process",
+    context: int = 0,
+    initial_context: bytes = b"",
+) -> None:
+    """
+    This function transforms input into output with overlapped I/O:
+        - a reader thread fills a bounded queue with chunks
+        - workers (processes, or threads for code releasing the GIL)
+          call transform(chunk, last, context) on each chunk
+        - a writer thread writes the results in order
+
+    context is the length of the previous chunk tail passed to
+    transform (initial_context for the first chunk), chunk_size
+    must be a multiple of the cipher block size.
+    """
+
+    chunks = Queue(queue_depth)
+    results = Queue(queue_depth)
+    stop = Event()
+    errors = []
+
+    def reader() -> None:
+        try:
+            previous = initial_context
+            chunk = input_.read(chunk_size)
+            while True:
+                following = input_.read(chunk_size) if chunk else b""
+                if not _put(chunks, (chunk, not following, previous), stop):
+                    return
+                if not following:
+                    break
+                if context:
+                    previous = chunk[-context:]
+                chunk = following
+        except BaseException as error:
+            errors.append(error)
+            stop.set()
+        finally:
+            _put(chunks, None, stop)
+
+    def writer() -> None:
+        while (future := results.get()) is not None:
+            if errors:
+                continue
+            try:
+                output.write(future.result())
+            except BaseException as error:
+                errors.append(error)
+                stop.set()
+
+    if executor == "process":
+        # workers are forked lazily, after the reader and writer threads
+        # start: fork them from a single-threaded server process instead
+        method = (
+            "forkserver"
+            if "forkserver" in get_all_start_methods()
+            else "spawn"
+        )
+        pool = ProcessPoolExecutor(workers, mp_context=get_context(method))
+    else:
+        pool = ThreadPoolExecutor(workers)
+
+    with pool:
+        threads = [Thread(target=reader), Thread(target=writer)]
+        for thread in threads:
+            thread.start()
+
+        try:
+            # the reader and the writer set stop on error, the reader
+            # can't always enqueue its sentinel then: poll stop
+            while not stop.is_set():
+                try:
+                    item = chunks.get(timeout=0.1)
+                except Empty:
+                    continue
+                if item is None:
+                    break
+                _put(results, pool.submit(transform, *item), stop)
+        finally:
+            stop.set()
+            results.put(None)
+            for thread in threads:
+                thread.join()
+
+    if errors:
+        raise errors[0]
@@ -0,0 +1,170 @@
+import sys
+import os
+
+__all__ = ["PROFILE_ENV", "Profiler", "phase", "profile"]
+
+from contextlib import contextmanager, nullcontext
+from collections import defaultdict, Counter
+from typing import Dict, Iterator, Optional
+from time import perf_counter
+
+PROFILE_ENV = "RC_PROFILE"
+
+_null_phase = nullcontext()
+_active = None
+
+
+class Profiler:
+
+    """
+    This class profiles a run of the RC5/RC6 entry points.
+
+    It combines cProfile (written as pstats), a lightweight sampling
+    profiler (written as collapsed stacks, ready for flamegraph tools)
+    and exclusive wall-clock timings for the named phases.
+    """
+
+    def __init__(self, prefix: str, interval: float = 0.001):
+        # imported here: the helpers load this module on every spawn
+        from threading import Event
+        from cProfile import Profile
+
+        self.prefix = prefix
+        self.interval = interval
+
+        self.phases: Dict[str, float] = defaultdict(float)
+        self.stacks: Counter = Counter()
+
+        self._phase_stack = []
+        self._mark = 0.0
+        self._profile = Profile()
+        self._stop = Event()
+        self._thread_id = None
+        self._sampler = None
+
+    def start(self) -> "Profiler":
+        """
+        This function starts the profilers.
+        """
+
+        from threading import Thread, get_ident
+
+        self._thread_id = get_ident()
+        self._sampler = Thread(target=self._sample, daemon=True)
+        self._sampler.start()
+        self._profile.enable()
+        return self
+
+    def stop(self) -> None:
+        """
+        This function stops the profilers and writes the reports.
+        """
+
+        self._profile.disable()
+        self._stop.set()
+        self._sampler.join()
+
+        self._profile.dump_stats(self.prefix + ".pstats")
+        with open(self.prefix + ".collapsed", "w") as file:
+            for stack, count in self.stacks.most_common():
+                file.write(f"{stack} {count}\n")
+
+        self.report(sys.stderr)
+
+    def record(self, name: str, seconds: float) -> None:
+        """
+        This function adds time measured outside of the profiler to a phase.
+        """
+
+        self.phases[name] += seconds
+
+    @contextmanager
+    def phase(self, name: str) -> Iterator[None]:
+        """
+        This function times a phase, nested phases are not charged
+        to their parent.
+        """
+
+        now = perf_counter()
+        if self._phase_stack:
+            self.phases[self._phase_stack[-1]] += now - self._mark
+
+        self._phase_stack.append(name)
+        self._mark = now
+
+        try:
+            yield
+        finally:
+            now = perf_counter()
+            self.phases[self._phase_stack.pop()] += now - self._mark
+            self._mark = now
+
+    def report(self, file) -> None:
+        """
+        This function writes the phases breakdown.
+        """
+
+        total = sum(self.phases.values()) or 1.0
+        for name, seconds in sorted(
+            self.phases.items(), key=lambda item: item[1], reverse=True
+        ):
+            file.write(
+                f"{name:<20} {seconds * 1000:>12.3f} ms"
+                f" {seconds * 100 / total:>6.1f} %\n"
+            )
+        file.flush()
+
+    def _sample(self) -> None:
+        """
+        This function samples the profiled thread stack until stopped.
+        """
+
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self._thread_id)
+            if frame is None:
+                continue
+
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(
+                    f"{os.path.basename(code.co_filename)}:{code.co_name}"
+                )
+                frame = frame.f_back
+
+            phases = self._phase_stack
+            if phases:
+                stack.append(f"[{phases[-1]}]")
+
+            self.stacks[";".join(reversed(stack))] += 1
+
+
+def phase(name: str):
+    """
+    This function returns a context manager timing the phase
+    when profiling is enabled (no-op otherwise).
+    """
+
+    if _active is None:
+        return _null_phase
+    return _active.phase(name)
+
+
+@contextmanager
+def profile(prefix: Optional[str]) -> Iterator[Optional[Profiler]]:
+    """
+    This function profiles the block when a report prefix is set.
+    """
+
+    global _active
+
+    if not prefix:
+        yield None
+        return
+
+    _active = Profiler(prefix).start()
+    try:
+        yield _active
+    finally:
+        profiler, _active = _active, None
+        profiler.stop()
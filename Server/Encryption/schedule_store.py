@@ -0,0 +1,266 @@
+import os
+
+__all__ = [
+    "SCHEDULE_STORE_ENV",
+    "ScheduleStore",
+    "load_schedule",
+    "save_schedule",
+]
+
+from typing import Iterator, List, Optional, Tuple
+from struct import Struct, error as StructError
+
+SCHEDULE_STORE_ENV = "RC_SCHEDULE_STORE"
+
+MAGIC = b"RCSCHED2"
+# magic, slots, record payload size
+HEADER = Struct("<8sII")
+# digest, state, word size, words number, generation
+RECORD = Struct("<32sBBHI")
+STATE_OFFSET = 32
+
+EMPTY = 0
+READY = 1
+WRITING = 2
+MAX_PROBES = 32
+
+# the store is a cache: these errors disable it, they don't fail callers
+ERRORS = (OSError, ValueError, ImportError, StructError)
+
+
+class ScheduleStore:
+
+    """
+    This class implements a memory mapped hash table of expanded key
+    schedules with fixed size records (open addressing, linear probing).
+
+    Readers don't lock: a writer marks a record WRITING and bumps its
+    generation before changing it, readers check that state and
+    generation did not change while they copied the record. Writers
+    are serialized with an exclusive flock on the file. When the
+    probing sequence is full, the first record of the sequence
+    is evicted.
+    """
+
+    def __init__(self, path: str, slots: int = 16384, record_size: int = 512):
+        from fcntl import flock, LOCK_EX, LOCK_UN
+        from mmap import mmap
+
+        self.path = path
+        self.mmap = None
+        fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+        try:
+            flock(fd, LOCK_EX)
+            if os.fstat(fd).st_size == 0:
+                os.ftruncate(
+                    fd, HEADER.size + slots * (RECORD.size + record_size)
+                )
+                os.pwrite(fd, HEADER.pack(MAGIC, slots, record_size), 0)
+            flock(fd, LOCK_UN)
+
+            size = os.fstat(fd).st_size
+            if size < HEADER.size:
+                raise ValueError("Invalid key schedule store")
+
+            self.mmap = mmap(fd, 0)
+            magic, self.slots, self.record_size = HEADER.unpack_from(self.mmap)
+            if (
+                magic != MAGIC
+                or not self.slots
+                or size
+                < HEADER.size + self.slots * (RECORD.size + self.record_size)
+            ):
+                raise ValueError("Invalid key schedule store")
+        except BaseException:
+            if self.mmap is not None:
+                self.mmap.close()
+            os.close(fd)
+            raise
+
+        self.fd = fd
+        self.slot_size = RECORD.size + self.record_size
+        os.register_at_fork(after_in_child=self._reopen)
+
+    def _reopen(self) -> None:
+        """
+        This function reopens the file in a forked child: flock locks
+        belong to the open file description shared with the parent.
+        """
+
+        fd, self.fd = self.fd, os.open(self.path, os.O_RDWR)
+        os.close(fd)
+
+    @staticmethod
+    def digest(algorithm: str, key: bytes, params: Tuple[int, ...]) -> bytes:
+        """
+        This function returns the record digest.
+        """
+
+        from hashlib import sha256
+
+        name = f"{algorithm}:{':'.join(map(str, params))}:".encode()
+        return sha256(name + key).digest()
+
+    def probe(self, digest: bytes) -> Iterator[Tuple[int, tuple]]:
+        """
+        This function yields offset and record header of the slots
+        in the probing sequence.
+        """
+
+        first = int.from_bytes(digest[:8], "little") % self.slots
+        for i in range(min(MAX_PROBES, self.slots)):
+            offset = HEADER.size + ((first + i) % self.slots) * self.slot_size
+            yield offset, RECORD.unpack_from(self.mmap, offset)
+
+    def load(self, digest: bytes) -> Optional[List[int]]:
+        """
+        This function returns the key schedule or None.
+        """
+
+        for offset, record in self.probe(digest):
+            record_digest, state, word_size, words, generation = record
+            if state == EMPTY:
+                return None
+            if state != READY or record_digest != digest:
+                continue
+
+            start = offset + RECORD.size
+            data = self.mmap[start : start + words * word_size]
+            if RECORD.unpack_from(self.mmap, offset) != record:
+                return None  # changed while reading
+
+            return [
+                int.from_bytes(data[i : i + word_size], "little")
+                for i in range(0, len(data), word_size)
+            ]
+
+        return None
+
+    def save(self, digest: bytes, schedule: List[int], word_size: int) -> bool:
+        """
+        This function stores the key schedule, returns False
+        when it's too large for a record.
+        """
+
+        from fcntl import flock, LOCK_EX, LOCK_UN
+
+        if len(schedule) * word_size > self.record_size:
+            return False
+
+        flock(self.fd, LOCK_EX)
+        try:
+            evicted = None
+            for offset, record in self.probe(digest):
+                if record[1] == READY and record[0] == digest:
+                    return True
+                if record[1] == EMPTY:
+                    break
+                evicted = evicted or (offset, record)
+            else:
+                offset, record = evicted
+
+            generation = (record[4] + 1) % 2**32
+            RECORD.pack_into(
+                self.mmap, offset, record[0], WRITING, 0, 0, generation
+            )
+
+            data = b"".join(
+                word.to_bytes(word_size, "little") for word in schedule
+            )
+            start = offset + RECORD.size
+            self.mmap[start : start + len(data)] = data
+            RECORD.pack_into(
+                self.mmap,
+                offset,
+                digest,
+                WRITING,
+                word_size,
+                len(schedule),
+                generation,
+            )
+            self.mmap[offset + STATE_OFFSET] = READY
+            return True
+        finally:
+            flock(self.fd, LOCK_UN)
+
+    def close(self) -> None:
+        """
+        This function unmaps the store.
+        """
+
+        self.mmap.close()
+        os.close(self.fd)
+
+
+_store = None
+_failed = None
+
+
+def _warn(message: str, error: BaseException) -> None:
+    """
+    This function logs a store error (logging is imported
+    only when it's needed).
+    """
+
+    from logging import getLogger
+
+    getLogger(__name__).warning("%s: %s", message, error)
+
+
+def get_store() -> Optional[ScheduleStore]:
+    """
+    This function returns the store configured by RC_SCHEDULE_STORE
+    (None when it's not set or can't be opened).
+    """
+
+    global _store, _failed
+
+    path = os.environ.get(SCHEDULE_STORE_ENV)
+    if not path or path == _failed:
+        return None
+    if _store is None:
+        try:
+            _store = ScheduleStore(path)
+        except ERRORS as error:
+            _failed = path
+            _warn("Key schedule store disabled", error)
+    return _store
+
+
+def load_schedule(
+    algorithm: str, key: bytes, params: Tuple[int, ...]
+) -> Optional[List[int]]:
+    """
+    This function returns the stored key schedule or None.
+    """
+
+    store = get_store()
+    if store is None:
+        return None
+
+    try:
+        return store.load(store.digest(algorithm, key, params))
+    except ERRORS as error:
+        _warn("Key schedule store error", error)
+        return None
+
+
+def save_schedule(
+    algorithm: str,
+    key: bytes,
+    params: Tuple[int, ...],
+    schedule: List[int],
+    word_size: int,
+) -> None:
+    """
+    This function stores the key schedule when a store is configured.
+    """
+
+    store = get_store()
+    if store is None:
+        return
+
+    try:
+        store.save(store.digest(algorithm, key, params), schedule, word_size)
+    except ERRORS as error:
+        _warn("Key schedule store error", error)
@@ -0,0 +1,129 @@
+import os
+import sys
+
+DIRECTORY = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, DIRECTORY)
+
+from tempfile import TemporaryDirectory
+from subprocess import run
+import unittest
+
+from compression import (
+    COMPRESSION_ENV,
+    COMPRESSED_FILE,
+    MAGIC,
+    compress,
+    decompress,
+)
+import RC5
+import RC6
+
+TEXT = "Compressible message, " * 50 + "çà ✓"
+
+
+def helper(script: str, *arguments: str, **environment: str):
+    return run(
+        [sys.executable, os.path.join(DIRECTORY, script), *arguments],
+        capture_output=True,
+        text=True,
+        env=dict(os.environ, **environment),
+    )
+
+
+class TestCompression(unittest.TestCase):
+    def test_compress(self):
+        data = TEXT.encode()
+        for method in ("zlib", "lzma"):
+            with self.subTest(method=method):
+                compressed = compress(data, method)
+                self.assertTrue(compressed.startswith(MAGIC))
+                self.assertLess(len(compressed), len(data))
+                self.assertEqual(decompress(compressed), data)
+                # RC5 decryption strips trailing NUL bytes
+                self.assertEqual(decompress(compressed.rstrip(b"\0")), data)
+
+    def test_unchanged(self):
+        data = TEXT.encode()
+        random = os.urandom(1000)
+        self.assertIs(compress(data, None), data)
+        short = data[:255]
+        self.assertIs(compress(short, "zlib"), short)
+        self.assertIs(compress(data, "zlib", len(data) + 1), data)
+        self.assertIs(compress(random, "zlib"), random)
+        self.assertIs(decompress(data), data)
+
+    def test_invalid_method(self):
+        for data in (b"", b"short", TEXT.encode()):
+            with self.subTest(length=len(data)):
+                with self.assertRaises(ValueError):
+                    compress(data, "gzip")
+
+    def test_helpers(self):
+        for module in (RC5, RC6):
+            for method in (None, "zlib", "lzma"):
+                for message in ("", "short", TEXT):
+                    with self.subTest(
+                        module=module.__name__, method=method, message=message
+                    ):
+                        key, encrypted = module.encrypt(
+                            message, compression=method
+                        )
+                        self.assertEqual(
+                            module.decrypt(encrypted, key), message
+                        )
+
+        _, compressed = RC6.encrypt(TEXT, compression="zlib")
+        _, uncompressed = RC6.encrypt(TEXT)
+        self.assertLess(len(compressed), len(uncompressed))
+
+    def test_helper_processes(self):
+        for script in ("RC5.py", "RC6.py"):
+            with self.subTest(script=script):
+                encrypted = helper(
+                    script, "encrypt", TEXT, **{COMPRESSION_ENV: "lzma"}
+                )
+                key, ciphertext = encrypted.stdout.split()
+                decrypted = helper(script, "decrypt", ciphertext, key)
+                self.assertEqual(decrypted.stdout, TEXT + "\n")
+
+                invalid = helper(
+                    script, "encrypt", "short", **{COMPRESSION_ENV: "gzip"}
+                )
+                self.assertNotEqual(invalid.returncode, 0)
+                self.assertIn("Invalid compression method", invalid.stderr)
+
+    def test_command_line(self):
+        # the last file starts like a compressed message but is not one
+        files = [TEXT.encode(), b"short", MAGIC + os.urandom(300)]
+        with TemporaryDirectory() as directory:
+            for i, data in enumerate(files):
+                with self.subTest(data=data[:8]):
+                    paths = [os.path.join(directory, name) for name in "ieo"]
+                    with open(paths[0], "wb") as file:
+                        file.write(data)
+
+                    encrypted = helper(
+                        "RC6.py",
+                        "-z",
+                        "zlib",
+                        "-i",
+                        paths[0],
+                        "-o",
+                        paths[1],
+                        "key",
+                    )
+                    self.assertEqual(encrypted.returncode, 0, encrypted.stderr)
+                    with open(paths[1], "rb") as file:
+                        header = file.read(len(COMPRESSED_FILE))
+                    self.assertEqual(header == COMPRESSED_FILE, i == 0)
+
+                    decrypted = helper(
+                        "RC6.py", "-d", "-i", paths[1], "-o", paths[2], "key"
+                    )
+                    self.assertEqual(decrypted.returncode, 0, decrypted.stderr)
+                    with open(paths[2], "rb") as file:
+                        self.assertEqual(file.read(), data)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,113 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from io import BytesIO
+import unittest
+
+from container import (
+    HEADER,
+    MAGIC,
+    VERSION,
+    ContainerReader,
+    ContainerWriter,
+    decrypt_file,
+    encrypt_file,
+)
+
+KEY = bytes(range(32))
+
+
+def encrypt(data: bytes, **parameters) -> BytesIO:
+    output = BytesIO()
+    encrypt_file(BytesIO(data), output, KEY, **parameters)
+    output.seek(0)
+    return output
+
+
+class TestContainer(unittest.TestCase):
+    def test_roundtrip(self):
+        for cipher in ("rc5", "rc6"):
+            for length in (0, 1, 99, 100, 101, 1000):
+                with self.subTest(cipher=cipher, length=length):
+                    data = os.urandom(length)
+                    output = BytesIO()
+                    decrypt_file(
+                        encrypt(data, cipher=cipher, chunk_size=100),
+                        output,
+                        KEY,
+                    )
+                    self.assertEqual(output.getvalue(), data)
+
+    def test_empty(self):
+        reader = ContainerReader(encrypt(b""), KEY)
+        self.assertEqual(reader.chunks, [])
+        self.assertEqual(reader.size, 0)
+        self.assertEqual(reader.read_range(0, 10), b"")
+
+    def test_read_range(self):
+        # 3 full chunks and a partial last chunk, 16 bytes blocks
+        data = os.urandom(350)
+        reader = ContainerReader(encrypt(data, chunk_size=100), KEY)
+        self.assertEqual(len(reader.chunks), 4)
+        self.assertEqual(reader.chunks[-1].length, 50)
+
+        ranges = [
+            (0, 350),
+            (0, 1),
+            (99, 2),  # chunk boundary
+            (95, 110),  # across two boundaries, unaligned blocks
+            (17, 15),  # inside one block
+            (300, 50),  # last partial chunk
+            (340, 100),  # past the end
+            (349, 1),
+            (350, 10),
+            (1000, 10),
+            (10, 0),
+        ]
+        for start, length in ranges:
+            with self.subTest(start=start, length=length):
+                self.assertEqual(
+                    reader.read_range(start, length),
+                    data[start : start + length],
+                )
+
+    def test_read_chunk(self):
+        data = os.urandom(250)
+        reader = ContainerReader(encrypt(data, chunk_size=100), KEY)
+        self.assertEqual(reader.read_chunk(2), data[200:])
+
+    def test_wrong_key(self):
+        data = os.urandom(100)
+        reader = ContainerReader(encrypt(data), bytes(32))
+        self.assertNotEqual(reader.read_range(0, 100), data)
+
+    def test_invalid_parameters(self):
+        for chunk_size in (0, -1):
+            with self.subTest(chunk_size=chunk_size):
+                with self.assertRaises(ValueError):
+                    ContainerWriter(BytesIO(), KEY, chunk_size=chunk_size)
+
+        with self.assertRaises(ValueError):
+            ContainerWriter(BytesIO(), KEY, cipher="rc5", w_bit=32)
+
+        reader = ContainerReader(encrypt(b"abc"), KEY)
+        with self.assertRaises(ValueError):
+            reader.read_range(-1, 1)
+        with self.assertRaises(ValueError):
+            reader.read_range(0, -1)
+
+    def test_invalid_container(self):
+        container = bytearray(encrypt(b"abc").getvalue())
+        zero_chunks = container.copy()
+        zero_chunks[: HEADER.size] = HEADER.pack(MAGIC, VERSION, 6, 32, 20, 0)
+        bad_magic = b"XXXX" + container[4:]
+
+        for data in (zero_chunks, bad_magic):
+            with self.assertRaises(ValueError):
+                ContainerReader(BytesIO(bytes(data)), KEY)
+
+
+if __name__ == "__main__":
+    unittest.main()
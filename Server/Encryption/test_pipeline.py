@@ -0,0 +1,83 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from threading import Thread
+from io import BytesIO
+from time import sleep
+import unittest
+
+from pipeline import run_pipeline
+
+
+def identity(chunk: bytes, last: bool, context: bytes) -> bytes:
+    return chunk
+
+
+class FailingInput(BytesIO):
+    def __init__(self, data: bytes, reads: int, delay: float = 0):
+        super().__init__(data)
+        self.reads = reads
+        self.delay = delay
+
+    def read(self, size: int = -1) -> bytes:
+        sleep(self.delay)
+        if self.reads == 0:
+            raise OSError("read failed")
+        self.reads -= 1
+        return super().read(size)
+
+
+class FullOutput(BytesIO):
+    def write(self, data: bytes) -> int:
+        raise OSError(28, "No space left on device")
+
+
+class TestPipeline(unittest.TestCase):
+    def run_pipeline(self, input_, output) -> list:
+        errors = []
+
+        def target() -> None:
+            try:
+                run_pipeline(
+                    input_, output, identity, chunk_size=16, executor="thread"
+                )
+            except Exception as error:
+                errors.append(error)
+
+        thread = Thread(target=target, daemon=True)
+        thread.start()
+        thread.join(10)
+        self.assertFalse(thread.is_alive(), "pipeline hangs")
+        return errors
+
+    def test_roundtrip(self):
+        data = os.urandom(1000)
+        output = BytesIO()
+        self.assertEqual(self.run_pipeline(BytesIO(data), output), [])
+        self.assertEqual(output.getvalue(), data)
+
+    def test_process_executor(self):
+        data = os.urandom(1000)
+        output = BytesIO()
+        run_pipeline(BytesIO(data), output, identity, chunk_size=16, workers=2)
+        self.assertEqual(output.getvalue(), data)
+
+    def test_read_error(self):
+        # the main loop is waiting for chunks when read() raises
+        errors = self.run_pipeline(
+            FailingInput(bytes(1000), 3, 0.2), BytesIO()
+        )
+        self.assertEqual([str(error) for error in errors], ["read failed"])
+
+    def test_write_error(self):
+        errors = self.run_pipeline(
+            FailingInput(bytes(1000), -1, 0.01), FullOutput()
+        )
+        self.assertEqual(len(errors), 1)
+        self.assertEqual(errors[0].errno, 28)
+
+
+if __name__ == "__main__":
+    unittest.main()
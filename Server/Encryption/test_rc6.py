@@ -0,0 +1,119 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import unittest
+
+from RC6 import RC6Encryption
+
+PLAINTEXT = bytes.fromhex("02132435465768798a9bacbdcedfe0f1")
+
+# RC6-32/20 test vectors from the RC6 paper: key, plaintext, ciphertext
+VECTORS = [
+    (
+        bytes(16),
+        bytes(16),
+        "8fc3a53656b1f778c129df4e9848a41e",
+    ),
+    (
+        bytes.fromhex("0123456789abcdef0112233445566778"),
+        PLAINTEXT,
+        "524e192f4715c6231f51f6367ea43f18",
+    ),
+    (
+        bytes(24),
+        bytes(16),
+        "6cd61bcb190b30384e8a3f168690ae82",
+    ),
+    (
+        bytes.fromhex("0123456789abcdef0112233445566778899aabbccddeeff0"),
+        PLAINTEXT,
+        "688329d019e505041e52e92af95291d4",
+    ),
+    (
+        bytes(32),
+        bytes(16),
+        "8f5fbd0510d15fa893fa3fda6e857ec2",
+    ),
+    (
+        bytes.fromhex(
+            "0123456789abcdef0112233445566778"
+            "899aabbccddeeff01032547698badcfe"
+        ),
+        PLAINTEXT,
+        "c8241816f0d7e48920ad16a1674e5d48",
+    ),
+]
+
+KEY = bytes.fromhex("000102030405060708090a0b0c0d0e0f")
+
+
+class TestRC6(unittest.TestCase):
+    def test_vectors(self):
+        for key, plaintext, ciphertext in VECTORS:
+            with self.subTest(key=key.hex()):
+                rc6 = RC6Encryption(key)
+                encrypted = rc6.encrypt_chunk_ECB(plaintext, last=False)
+                self.assertEqual(encrypted.hex(), ciphertext)
+                self.assertEqual(
+                    rc6.decrypt_chunk_ECB(encrypted, last=False), plaintext
+                )
+
+    def lengths(self, rc6: RC6Encryption):
+        block = rc6.block_size
+        for length in (0, 1, block - 1, block, block + 1, 3 * block + 5):
+            with self.subTest(w_bit=rc6.w_bit, length=length):
+                yield os.urandom(length)
+
+    def test_ECB(self):
+        for w_bit in (16, 32, 64):
+            rc6 = RC6Encryption(KEY, w_bit=w_bit)
+            self.assertEqual(rc6.block_size, w_bit // 2)
+            for data in self.lengths(rc6):
+                encrypted = rc6.data_encryption_ECB(data)
+                self.assertEqual(
+                    len(encrypted),
+                    (len(data) // rc6.block_size + 1) * rc6.block_size,
+                )
+                self.assertEqual(rc6.data_decryption_ECB(encrypted), data)
+
+    def test_CBC(self):
+        for w_bit in (16, 32, 64):
+            rc6 = RC6Encryption(KEY, w_bit=w_bit)
+            for data in self.lengths(rc6):
+                iv, encrypted = rc6.data_encryption_CBC(data)
+                self.assertEqual(len(iv), rc6.block_size)
+                self.assertEqual(rc6.data_decryption_CBC(encrypted, iv), data)
+
+    def test_chunks(self):
+        # chunk functions (pipelined files) match the full data functions
+        for w_bit in (16, 32, 64):
+            rc6 = RC6Encryption(KEY, w_bit=w_bit)
+            iv = os.urandom(rc6.block_size)
+            for data in self.lengths(rc6):
+                encrypted = rc6.encrypt_chunk_ECB(data)
+                self.assertEqual(encrypted, rc6.data_encryption_ECB(data))
+                self.assertEqual(rc6.decrypt_chunk_ECB(encrypted), data)
+
+                encrypted = rc6.encrypt_chunk_CBC(data, True, iv)
+                self.assertEqual(
+                    encrypted, rc6.data_encryption_CBC(data, iv)[1]
+                )
+                self.assertEqual(
+                    rc6.decrypt_chunk_CBC(encrypted, True, iv), data
+                )
+
+    def test_word_sizes(self):
+        ciphertexts = {
+            RC6Encryption(KEY, w_bit=w_bit).data_encryption_ECB(PLAINTEXT)
+            for w_bit in (16, 32, 64)
+        }
+        self.assertEqual(len(ciphertexts), 3)
+
+        with self.assertRaises(ValueError):
+            RC6Encryption(KEY, w_bit=8)
+
+
+if __name__ == "__main__":
+    unittest.main()
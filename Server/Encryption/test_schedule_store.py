@@ -0,0 +1,85 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from tempfile import TemporaryDirectory
+from unittest import mock
+import unittest
+
+import schedule_store
+from schedule_store import (
+    HEADER,
+    SCHEDULE_STORE_ENV,
+    ScheduleStore,
+    load_schedule,
+    save_schedule,
+)
+
+
+class TestScheduleStore(unittest.TestCase):
+    def setUp(self):
+        self.directory = TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+        self.path = os.path.join(self.directory.name, "store")
+
+    def use_store(self, path: str) -> None:
+        patches = [
+            mock.patch.dict(os.environ, {SCHEDULE_STORE_ENV: path}),
+            mock.patch.object(schedule_store, "_store", None),
+            mock.patch.object(schedule_store, "_failed", None),
+        ]
+        for patch in patches:
+            patch.start()
+            self.addCleanup(patch.stop)
+
+    def test_load_save(self):
+        self.use_store(self.path)
+        self.assertIsNone(load_schedule("rc6", b"key", (20, 32)))
+
+        save_schedule("rc6", b"key", (20, 32), [1, 2**32 - 1, 3], 4)
+        self.assertEqual(
+            load_schedule("rc6", b"key", (20, 32)), [1, 2**32 - 1, 3]
+        )
+        self.assertIsNone(load_schedule("rc6", b"key", (12, 32)))
+        self.assertEqual(os.stat(self.path).st_mode & 0o777, 0o600)
+        schedule_store._store.close()
+
+    def test_eviction(self):
+        store = ScheduleStore(self.path, slots=4, record_size=8)
+        self.addCleanup(store.close)
+
+        digests = [store.digest("rc6", bytes([i]), ()) for i in range(6)]
+        for i, digest in enumerate(digests):
+            self.assertTrue(store.save(digest, [i], 4))
+            self.assertEqual(store.load(digest), [i])
+
+        self.assertFalse(store.save(digests[0], [1, 2, 3], 4))
+
+    def test_invalid_store(self):
+        def write(data: bytes) -> str:
+            path = os.path.join(self.directory.name, str(len(data)))
+            with open(path, "wb") as file:
+                file.write(data)
+            return path
+
+        paths = [
+            write(b"garbage"),
+            write(HEADER.pack(b"RCSCHED1", 16, 512) + bytes(1000)),
+            write(HEADER.pack(b"RCSCHED2", 16, 512)),  # truncated
+            os.path.join(self.directory.name, "missing", "store"),
+        ]
+        descriptors = len(os.listdir("/proc/self/fd"))
+
+        for path in paths:
+            with self.subTest(path=path):
+                self.use_store(path)
+                with self.assertLogs("schedule_store", "WARNING"):
+                    self.assertIsNone(load_schedule("rc6", b"key", ()))
+                save_schedule("rc6", b"key", (), [1], 4)
+
+        self.assertEqual(len(os.listdir("/proc/self/fd")), descriptors)
+
+
+if __name__ == "__main__":
+    unittest.main()
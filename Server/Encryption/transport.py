@@ -0,0 +1,373 @@
+import sys
+import os
+
+__all__ = ["RingBuffer", "EngineClient", "serve"]
+
+from argparse import Namespace, ArgumentParser
+from typing import Tuple, TextIO
+from subprocess import Popen, PIPE
+from tempfile import gettempdir, mkdtemp
+from shutil import rmtree
+from struct import Struct
+from mmap import mmap
+from json import dumps, loads
+
+from keypool import token_bytes, set_batch_size
+from RC6 import RC6Encryption
+from RC5 import RC5
+
+# capacity, head (written by the producer), tail (written by the consumer)
+HEADER = Struct("<QQQ")
+COUNTER = Struct("<Q")
+HEAD_OFFSET = 8
+TAIL_OFFSET = 16
+SHM_DIRECTORY = "/dev/shm" if os.path.isdir("/dev/shm") else gettempdir()
+
+
+class RingBuffer:
+
+    """
+    This class implements a single producer/single consumer ring buffer
+    in a memory mapped file shared between processes.
+
+    Positions are monotonic counters, the offset in the buffer is
+    position % capacity. A region never wraps: when it does not fit
+    at the end of the buffer the producer skips to the start.
+    """
+
+    def __init__(self, path: str, capacity: int = None):
+        self.path = path
+
+        if capacity is None:
+            with open(path, "r+b") as file:
+                self.mmap = mmap(file.fileno(), 0)
+            self.capacity, _, _ = HEADER.unpack_from(self.mmap)
+        else:
+            fd = os.open(path, os.O_RDWR | os.O_CREAT | os.O_EXCL, 0o600)
+            try:
+                os.ftruncate(fd, HEADER.size + capacity)
+                self.mmap = mmap(fd, HEADER.size + capacity)
+            finally:
+                os.close(fd)
+            self.capacity = capacity
+            HEADER.pack_into(self.mmap, 0, capacity, 0, 0)
+
+        self.buffer = memoryview(self.mmap)[HEADER.size :]
+
+    @property
+    def head(self) -> int:
+        return COUNTER.unpack_from(self.mmap, HEAD_OFFSET)[0]
+
+    @property
+    def tail(self) -> int:
+        return COUNTER.unpack_from(self.mmap, TAIL_OFFSET)[0]
+
+    def reserve(self, length: int) -> Tuple[int, memoryview]:
+        """
+        This function reserves length bytes (producer side) and returns
+        the position and a writable view on the region.
+        """
+
+        if length > self.capacity:
+            raise ValueError("Payload is larger than the ring buffer")
+
+        position = self.head
+        offset = position % self.capacity
+        if offset + length > self.capacity:
+            position += self.capacity - offset
+            offset = 0
+
+        if position + length - self.tail > self.capacity:
+            raise BufferError("Ring buffer is full")
+
+        COUNTER.pack_into(self.mmap, HEAD_OFFSET, position + length)
+        return position, self.buffer[offset : offset + length]
+
+    def write(self, data: bytes) -> Tuple[int, int]:
+        """
+        This function copies data into the ring buffer (producer side)
+        and returns its position and length.
+        """
+
+        position, view = self.reserve(len(data))
+        view[:] = data
+        view.release()
+        return position, len(data)
+
+    def read(self, position: int, length: int) -> memoryview:
+        """
+        This function returns a view on a region (consumer side),
+        the view is valid until the region is released.
+        """
+
+        offset = position % self.capacity
+        return self.buffer[offset : offset + length]
+
+    def release(self, position: int, length: int) -> None:
+        """
+        This function frees a region and all regions before it
+        (consumer side).
+        """
+
+        COUNTER.pack_into(self.mmap, TAIL_OFFSET, position + length)
+
+    def close(self, unlink: bool = False) -> None:
+        """
+        This function unmaps the ring buffer.
+        """
+
+        self.buffer.release()
+        self.mmap.close()
+        if unlink:
+            os.unlink(self.path)
+
+
+def process(
+    request: dict, requests: RingBuffer, responses: RingBuffer
+) -> dict:
+    """
+    This function encrypts or decrypts one payload from the request
+    ring buffer into the response ring buffer.
+
+    The ciphers read the request region in place, except RC6 encryption
+    which copies the payload once to add the PKCS padding. The result
+    is copied once into the response ring buffer.
+
+    RC5 zero pads the last block: encryption responses carry the
+    plaintext_length, decryption requests should send it back to get
+    the exact plaintext (trailing NUL bytes are stripped otherwise).
+    """
+
+    position, length = request["position"], request["length"]
+    view = requests.read(position, length)
+
+    try:
+        # new keys are single-use, only decryption uses the schedule store
+        if request["op"] == "encrypt":
+            key = token_bytes(request.get("key_length", 128) // 8)
+            rc5_class, rc6_class = RC5, RC6Encryption
+        else:
+            key = bytes.fromhex(request["key"])
+            rc5_class, rc6_class = RC5.cached, RC6Encryption.cached
+
+        if request.get("algorithm", "rc6") == "rc5":
+            rc5 = rc5_class(64, 12, key)
+            if request["op"] == "encrypt":
+                data = rc5.encryptChunk(view)
+            elif "plaintext_length" in request:
+                data = rc5.decryptChunk(view)[: request["plaintext_length"]]
+            else:
+                data = rc5.decryptBytes(view)
+        else:
+            rc6 = rc6_class(key, rounds=20)
+            if request["op"] == "encrypt":
+                data = rc6.data_encryption_ECB(bytes(view))
+            else:
+                data = rc6.data_decryption_ECB(view)
+    finally:
+        view.release()
+        requests.release(position, length)
+
+    response = {"id": request.get("id"), "key": key.hex()}
+    if request["op"] == "encrypt":
+        response["plaintext_length"] = length
+
+    response["position"], response["length"] = responses.write(data)
+    return response
+
+
+def serve(
+    requests: RingBuffer,
+    responses: RingBuffer,
+    input_: TextIO = sys.stdin,
+    output: TextIO = sys.stdout,
+) -> None:
+    """
+    This function handles control messages (one JSON object per line)
+    until the end of input, invalid messages get an error response.
+    """
+
+    for line in input_:
+        if not line.strip():
+            continue
+
+        request = {}
+        try:
+            message = loads(line)
+            if not isinstance(message, dict):
+                raise ValueError("Control messages must be JSON objects")
+            request = message
+            response = process(request, requests, responses)
+        except Exception as error:
+            response = {"id": request.get("id"), "error": str(error)}
+
+        output.write(dumps(response) + "\n")
+        output.flush()
+
+
+class EngineClient:
+
+    """
+    This class starts a crypto engine process and exchanges payloads
+    through the shared ring buffers.
+    """
+
+    def __init__(self, name: str = None, capacity: int = 64 * 1024 * 1024):
+        name = name or f"rc-engine-{os.getpid()}"
+        self.process = Popen(
+            [
+                sys.executable,
+                os.path.abspath(__file__),
+                "--name",
+                name,
+                "--capacity",
+                str(capacity),
+            ],
+            stdin=PIPE,
+            stdout=PIPE,
+            text=True,
+        )
+
+        ready = loads(self.process.stdout.readline())
+        self.requests = RingBuffer(ready["request"])
+        self.responses = RingBuffer(ready["response"])
+        self.id = 0
+
+    def call(self, op: str, data: bytes, **parameters) -> Tuple[str, bytes]:
+        """
+        This function sends one payload to the engine and returns
+        the key (hexadecimal) and the result.
+
+        The payload is copied once into the request ring buffer and the
+        result once out of the response ring buffer (so its region is
+        released at once).
+        """
+
+        self.id += 1
+        position, length = self.requests.write(data)
+        request = dict(
+            parameters, id=self.id, op=op, position=position, length=length
+        )
+        self.process.stdin.write(dumps(request) + "\n")
+        self.process.stdin.flush()
+
+        response = loads(self.process.stdout.readline())
+        if "error" in response:
+            raise RuntimeError(response["error"])
+
+        view = self.responses.read(response["position"], response["length"])
+        data = bytes(view)
+        view.release()
+        self.responses.release(response["position"], response["length"])
+        return response["key"], data
+
+    def encrypt(
+        self, data: bytes, algorithm: str = "rc6"
+    ) -> Tuple[str, bytes]:
+        """
+        This function encrypts data with a new key.
+        """
+
+        return self.call("encrypt", data, algorithm=algorithm)
+
+    def decrypt(
+        self,
+        data: bytes,
+        key: str,
+        algorithm: str = "rc6",
+        plaintext_length: int = None,
+    ) -> bytes:
+        """
+        This function decrypts data with the key (hexadecimal),
+        plaintext_length is needed to keep trailing NUL bytes with RC5.
+        """
+
+        parameters = {"algorithm": algorithm, "key": key}
+        if plaintext_length is not None:
+            parameters["plaintext_length"] = plaintext_length
+        return self.call("decrypt", data, **parameters)[1]
+
+    def close(self) -> None:
+        """
+        This function stops the engine.
+        """
+
+        self.requests.close()
+        self.responses.close()
+        self.process.stdin.close()
+        self.process.wait()
+        self.process.stdout.close()
+
+
+def parse_args() -> Namespace:
+    """
+    This function parse command line arguments.
+    """
+
+    parser = ArgumentParser(
+        description=(
+            "This script runs the crypto engine, payloads are exchanged"
+            " through shared memory ring buffers and control messages"
+            " through stdin/stdout."
+        )
+    )
+    parser.add_argument(
+        "--name",
+        "-n",
+        help="Ring buffers directory name prefix.",
+        default=f"rc-engine-{os.getpid()}",
+    )
+    parser.add_argument(
+        "--capacity",
+        "-c",
+        type=int,
+        help="Ring buffers capacity in bytes.",
+        default=64 * 1024 * 1024,
+    )
+    parser.add_argument(
+        "--directory",
+        "-d",
+        help="Parent directory of the ring buffers directory.",
+        default=SHM_DIRECTORY,
+    )
+    return parser.parse_args()
+
+
+def main() -> int:
+    """
+    This function executes this file from the command line.
+    """
+
+    arguments = parse_args()
+    set_batch_size(64 * 1024)  # long-running, amortize entropy reads
+
+    # the rings contain plaintexts and keys: a private (0700) directory
+    # with a random name, files created exclusively
+    directory = mkdtemp(prefix=arguments.name + "-", dir=arguments.directory)
+    try:
+        requests = RingBuffer(
+            os.path.join(directory, "request"), arguments.capacity
+        )
+        responses = RingBuffer(
+            os.path.join(directory, "response"), arguments.capacity
+        )
+
+        print(
+            dumps(
+                {
+                    "request": requests.path,
+                    "response": responses.path,
+                    "capacity": arguments.capacity,
+                }
+            ),
+            flush=True,
+        )
+        serve(requests, responses)
+    finally:
+        rmtree(directory)
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())